@@ -1,11 +1,13 @@
 import express from 'express';
 import multer from 'multer';
+import crypto from 'crypto';
 import fs from 'fs';
 import path from 'path';
 import { fileURLToPath } from 'url';
 import { parse } from 'csv-parse/sync';
 import { buildPortfolioModel } from './portfolio.js';
 import { computePortfolioPerformance } from './performance.js';
+import { startPriceRefresher } from './priceProviders.js';
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
@@ -27,77 +29,114 @@ function clearCsvs(folder) {
   }
 }
 
+// basename keeps a client-supplied filename from escaping the upload folder.
+async function storeUpload(req, res, folder, kind) {
+  if (!req.file || !req.file.originalname.toLowerCase().endsWith('.csv')) {
+    if (req.file) await fs.promises.unlink(req.file.path);
+    return res.status(400).json({ detail: 'Upload a .csv file' });
+  }
+  const name = path.basename(req.file.originalname);
+  clearCsvs(folder);
+  await fs.promises.rename(req.file.path, path.join(folder, name));
+  res.json({ ok: true, filename: name, kind });
+}
+
 app.use('/app', express.static(path.join(ROOT, 'frontend')));
 
+const INDEX_FILE = path.join(ROOT, 'frontend', 'index.html');
+const INDEX_HTML = fs.existsSync(INDEX_FILE) ? fs.readFileSync(INDEX_FILE) : null;
+
 app.get('/', (req, res) => {
-  const idx = path.join(ROOT, 'frontend', 'index.html');
-  if (fs.existsSync(idx)) {
-    res.sendFile(idx);
+  if (INDEX_HTML) {
+    res.type('html').send(INDEX_HTML);
   } else {
     res.status(500).send(`<pre>Frontend missing</pre><p>Support the project on <a href="https://ko-fi.com/gille" target="_blank">Ko-fi</a>.</p>`);
   }
 });
 
-app.post('/upload', upload.single('file'), (req, res) => {
-  if (!req.file || !req.file.originalname.toLowerCase().endsWith('.csv')) {
-    if (req.file) fs.unlinkSync(req.file.path);
-    return res.status(400).json({ detail: 'Upload a .csv file' });
-  }
-  clearCsvs(UPLOADS_DIR, req.file.filename);
-  const dest = path.join(UPLOADS_DIR, req.file.originalname);
-  fs.renameSync(req.file.path, dest);
-  res.json({ ok: true, filename: req.file.originalname, kind: 'activity' });
-});
+app.post('/upload', upload.single('file'), wrapAsync((req, res) => storeUpload(req, res, UPLOADS_DIR, 'activity')));
 
-app.post('/upload_positions', uploadPositions.single('file'), (req, res) => {
-  if (!req.file || !req.file.originalname.toLowerCase().endsWith('.csv')) {
-    if (req.file) fs.unlinkSync(req.file.path);
-    return res.status(400).json({ detail: 'Upload a .csv file' });
-  }
-  clearCsvs(POSITIONS_DIR, req.file.filename);
-  const dest = path.join(POSITIONS_DIR, req.file.originalname);
-  fs.renameSync(req.file.path, dest);
-  res.json({ ok: true, filename: req.file.originalname, kind: 'positions' });
-});
+app.post('/upload_positions', uploadPositions.single('file'), wrapAsync((req, res) => storeUpload(req, res, POSITIONS_DIR, 'positions')));
 
 app.post('/clear', (req, res) => {
   clearCsvs(UPLOADS_DIR);
   clearCsvs(POSITIONS_DIR);
+  RESPONSE_CACHE.clear();
   res.json({ ok: true });
 });
 
-function readManyCsv(folder) {
-  const files = fs.readdirSync(folder).filter(f => f.endsWith('.csv'));
-  let rows = [];
-  for (const f of files) {
-    const txt = fs.readFileSync(path.join(folder, f), 'utf8');
-    const lines = txt.split(/\r?\n/);
-    const hdrIdx = lines.findIndex(line => /Account Number/i.test(line) && /Description/i.test(line));
-    if (hdrIdx === -1) continue;
-    const data = lines.slice(hdrIdx).join('\n');
-    const parsed = parse(data, {
-      columns: true,
-      skip_empty_lines: true,
-      bom: true,
-      relax_column_count: true
-    });
-    rows = rows.concat(parsed);
-  }
-  return rows;
+async function parseCsvFile(file) {
+  const txt = await fs.promises.readFile(file, 'utf8');
+  const digest = crypto.createHash('sha1').update(txt).digest('hex');
+  const lines = txt.split(/\r?\n/);
+  const hdrIdx = lines.findIndex(line => /Account Number/i.test(line) && /Description/i.test(line));
+  if (hdrIdx === -1) return { rows: [], digest };
+  const data = lines.slice(hdrIdx).join('\n');
+  const rows = parse(data, {
+    columns: true,
+    skip_empty_lines: true,
+    bom: true,
+    relax_column_count: true
+  });
+  return { rows, digest };
+}
+
+// A file cleared by a concurrent calculation after the listing is skipped.
+async function readManyCsv(folder) {
+  const files = (await fs.promises.readdir(folder)).filter(f => f.endsWith('.csv')).sort();
+  const results = await Promise.all(files.map(async f => {
+    try {
+      return await parseCsvFile(path.join(folder, f));
+    } catch (err) {
+      if (err.code === 'ENOENT') return null;
+      throw new Error(`Failed to read ${f}: ${err.message}`, { cause: err });
+    }
+  }));
+  const entries = results.filter(Boolean);
+  const hash = crypto.createHash('sha1');
+  for (const entry of entries) hash.update(entry.digest);
+  const rows = entries.length === 1 ? entries[0].rows : entries.flatMap(entry => entry.rows);
+  return { rows, digest: hash.digest('hex') };
+}
+
+const RESPONSE_TTL_MS = 15 * 60 * 1000;
+const RESPONSE_CACHE = new Map();
+const RESPONSE_CACHE_MAX = 4;
+
+function sendPortfolio(res, entry) {
+  res.set('ETag', entry.etag);
+  res.json(entry.result);
 }
 
 async function servePortfolio(req, res) {
-  const actRows = readManyCsv(UPLOADS_DIR);
-  const posRows = readManyCsv(POSITIONS_DIR);
+  const [act, pos] = await Promise.all([readManyCsv(UPLOADS_DIR), readManyCsv(POSITIONS_DIR)]);
+  const actRows = act.rows;
+  const posRows = pos.rows;
   if (actRows.length === 0 || posRows.length === 0) {
     return res.status(400).json({ detail: 'Upload both an activity CSV and a positions CSV first' });
   }
+  const key = `${act.digest}|${pos.digest}`;
+  const cached = RESPONSE_CACHE.get(key);
+  if (cached && Date.now() - cached.ts <= RESPONSE_TTL_MS) {
+    console.log('Serving cached portfolio');
+    clearCsvs(UPLOADS_DIR);
+    clearCsvs(POSITIONS_DIR);
+    return sendPortfolio(res, cached);
+  }
   console.log(`Computing portfolio for ${actRows.length} activity rows and ${posRows.length} position rows`);
   const model = buildPortfolioModel(actRows, posRows);
   const result = await computePortfolioPerformance(model);
   clearCsvs(UPLOADS_DIR);
   clearCsvs(POSITIONS_DIR);
-  res.json(result);
+  const ts = Date.now();
+  const etag = `"${crypto.createHash('sha1').update(`${key}|${ts}`).digest('hex')}"`;
+  const entry = { ts, etag, result };
+  RESPONSE_CACHE.delete(key);
+  RESPONSE_CACHE.set(key, entry);
+  while (RESPONSE_CACHE.size > RESPONSE_CACHE_MAX) {
+    RESPONSE_CACHE.delete(RESPONSE_CACHE.keys().next().value);
+  }
+  sendPortfolio(res, entry);
 }
 
 function wrapAsync(fn) {
@@ -116,6 +155,7 @@ app.get('/recalc', wrapAsync(servePortfolio));
 const PORT = process.env.PORT || 8000;
 app.listen(PORT, () => {
   console.log(`Node Total Return server running on ${PORT}`);
+  startPriceRefresher();
   console.log('Support the project at https://ko-fi.com/gille');
 });
 
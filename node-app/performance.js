@@ -45,6 +45,36 @@ function buildSharesSeries(ledger, dates) {
   return out;
 }
 
+// Last day falls back to the spot price; leading gaps take the first close.
+function buildPriceSeries(history, dates, currentPrice) {
+  const points = [];
+  for (const entry of history) {
+    const day = normalizeDate(entry.date);
+    if (day) points.push([day.getTime(), entry.close]);
+  }
+  points.sort((a, b) => a[0] - b[0]);
+  const out = new Array(dates.length).fill(null);
+  const lastIdx = dates.length - 1;
+  let j = 0;
+  let lastSeen = null;
+  let firstSeen = -1;
+  for (let i = 0; i < dates.length; i += 1) {
+    const key = dates[i].getTime();
+    let price = null;
+    while (j < points.length && points[j][0] <= key) {
+      if (points[j][0] === key) price = points[j][1];
+      j += 1;
+    }
+    if (price == null && i === lastIdx) price = currentPrice ?? null;
+    if (price == null) price = lastSeen;
+    else lastSeen = price;
+    if (price != null && firstSeen === -1) firstSeen = i;
+    out[i] = price;
+  }
+  if (firstSeen > 0) out.fill(out[firstSeen], 0, firstSeen);
+  return out;
+}
+
 function buildCashflowSeries(ledger, dates) {
   const map = new Map();
   for (const cf of ledger.cashflows || []) {
@@ -195,8 +225,10 @@ export async function computePortfolioPerformance(model) {
   }
   const start = model.startDate || addDays(new Date(), -365);
   const end = new Date();
-  const currentPrices = await getCurrentPrices(symbols);
-  const priceHistory = await getPriceHistory(symbols, start, end, '1d');
+  const [currentPrices, priceHistory] = await Promise.all([
+    getCurrentPrices(symbols),
+    getPriceHistory(symbols, start, end, '1d'),
+  ]);
   const dateIndex = dateRange(start, end);
 
   const rows = [];
@@ -216,33 +248,8 @@ export async function computePortfolioPerformance(model) {
     const ledger = model.symbols[symbol];
     const currentPrice = currentPrices[symbol];
     if (currentPrice == null) missingPrices.push(symbol);
-    const priceSeriesRaw = priceHistory[symbol] || [];
-    const priceSeriesMap = new Map(priceSeriesRaw.map(entry => [normalizeDate(entry.date).getTime(), entry.close]));
     const sharesSeries = buildSharesSeries(ledger, dateIndex);
-    const priceSeries = dateIndex.map(date => {
-      const key = date.getTime();
-      if (priceSeriesMap.has(key)) return priceSeriesMap.get(key);
-      return null;
-    });
-    if (priceSeries[priceSeries.length - 1] == null && currentPrice != null) {
-      priceSeries[priceSeries.length - 1] = currentPrice;
-    }
-    let lastSeen = null;
-    for (let i = 0; i < priceSeries.length; i += 1) {
-      if (priceSeries[i] == null && lastSeen != null) {
-        priceSeries[i] = lastSeen;
-      }
-      if (priceSeries[i] != null) {
-        lastSeen = priceSeries[i];
-      }
-    }
-    lastSeen = null;
-    for (let i = priceSeries.length - 1; i >= 0; i -= 1) {
-      if (priceSeries[i] == null && lastSeen != null) {
-        priceSeries[i] = lastSeen;
-      }
-      if (priceSeries[i] != null) lastSeen = priceSeries[i];
-    }
+    const priceSeries = buildPriceSeries(priceHistory[symbol] || [], dateIndex, currentPrice);
     const cashflowSeries = buildCashflowSeries(ledger, dateIndex);
     const marketValueSeries = priceSeries.map((price, idx) => (price == null ? 0 : price * sharesSeries[idx]));
     const { nav, units } = combineSeries(marketValueSeries, cashflowSeries);
@@ -326,10 +333,15 @@ export async function computePortfolioPerformance(model) {
   const { nav: overallNav, units: overallUnits } = combineSeries(overallMV, overallCF);
   const overallHistory = buildHistoryFrame('OVERALL', dateIndex, overallUnits.map(() => 0), overallMV.map(() => null), overallCF, overallNav, overallUnits);
 
-  const activeRows = rows.filter(row => !row.closed);
-  const invested = activeRows.reduce((acc, row) => acc + (row.net_invested_cash || 0), 0);
-  const dividends = activeRows.reduce((acc, row) => acc + (row.dividends_received || 0), 0);
-  const marketValue = activeRows.reduce((acc, row) => acc + (row.market_value || 0), 0);
+  let invested = 0;
+  let dividends = 0;
+  let marketValue = 0;
+  for (const row of rows) {
+    if (row.closed) continue;
+    invested += row.net_invested_cash || 0;
+    dividends += row.dividends_received || 0;
+    marketValue += row.market_value || 0;
+  }
   const marketGain = marketValue - invested;
   const totalReturn = marketValue + dividends - invested;
   const overallTwr = computeTwr(overallUnits, overallNav);
@@ -24,9 +24,23 @@ const DATE_CANDIDATES = [
   "Settlement Date",
 ];
 
-function isCashLike(symbolRaw, desc) {
-  const s = (symbolRaw || "").trim().toUpperCase();
-  const d = (desc || "").trim().toUpperCase();
+const UPPER_TRIM = new Map();
+const UPPER_TRIM_MAX = 50000;
+
+function upperTrim(value) {
+  if (value === undefined || value === null) return "";
+  const raw = String(value);
+  let out = UPPER_TRIM.get(raw);
+  if (out === undefined) {
+    out = raw.trim().toUpperCase();
+    if (UPPER_TRIM.size >= UPPER_TRIM_MAX) UPPER_TRIM.clear();
+    UPPER_TRIM.set(raw, out);
+  }
+  return out;
+}
+
+// Expects symbol and description already passed through upperTrim.
+function isCashLike(s, d) {
   if (!s && !d) return true;
   if (s.startsWith("SPAXX")) return true;
   if (CASH_TICKERS.has(s)) return true;
@@ -34,21 +48,23 @@ function isCashLike(symbolRaw, desc) {
   return false;
 }
 
+function normUpperSymbol(s) {
+  if (!s || CASH_TICKERS.has(s)) return null;
+  return s.startsWith("$") ? s.slice(1) : s;
+}
+
 function normSymbol(value) {
   if (value === undefined || value === null) return null;
-  let s = String(value).trim().toUpperCase();
-  if (!s || CASH_TICKERS.has(s)) return null;
-  if (s.startsWith("$")) s = s.slice(1);
-  return s;
+  return normUpperSymbol(String(value).trim().toUpperCase());
 }
 
 const SYMBOL_FROM_DESC = /^([A-Z][A-Z0-9\.]{0,9})/;
 const SYMBOL_IN_PARENS = /\(([A-Z][A-Z0-9\.]{0,9})\)/;
 
-function extractSymbol(symRaw, desc, action) {
-  const norm = normSymbol(symRaw);
+// Symbol and description are expected in upperTrim form.
+function extractSymbol(s, d, action) {
+  const norm = normUpperSymbol(s);
   if (norm) return norm;
-  const d = (desc || "").trim().toUpperCase();
   const a = (action || "").toUpperCase();
   const paren = a.match(SYMBOL_IN_PARENS) || d.match(SYMBOL_IN_PARENS);
   if (paren) return normSymbol(paren[1]);
@@ -57,11 +73,14 @@ function extractSymbol(symRaw, desc, action) {
   return null;
 }
 
+const NUMBER_STRIP = /[\$,%\s]/g;
+const NUMBER_PARENS = /^\((.*)\)$/;
+
 function toNumber(val) {
   if (val === undefined || val === null) return 0;
-  let s = String(val).trim();
-  s = s.replace(/[\$,]/g, "").replace(/%/g, "");
-  const m = s.match(/^\((.*)\)$/);
+  if (typeof val === "number") return Number.isFinite(val) ? val : 0;
+  let s = String(val).replace(NUMBER_STRIP, "");
+  const m = NUMBER_PARENS.exec(s);
   if (m) s = `-${m[1]}`;
   const n = parseFloat(s);
   return Number.isFinite(n) ? n : 0;
@@ -71,7 +90,7 @@ function dedupe(rows) {
   const seen = new Set();
   const out = [];
   for (const row of rows) {
-    const key = JSON.stringify(row);
+    const key = Object.values(row).join("\u001f");
     if (!seen.has(key)) {
       seen.add(key);
       out.push(row);
@@ -90,8 +109,7 @@ function extractDate(row) {
   return null;
 }
 
-function classifyAction(action) {
-  if (!action) return "other";
+function matchAction(action) {
   if (DIV_PAT.test(action)) return "dividend";
   if (REINVEST_PAT.test(action)) return "reinvest";
   if (SELL_PAT.test(action)) return "sell";
@@ -99,15 +117,54 @@ function classifyAction(action) {
   return "other";
 }
 
+const ACTION_TYPES = new Map();
+const ACTION_TYPES_MAX = 10000;
+
+function classifyAction(action) {
+  if (!action) return "other";
+  let type = ACTION_TYPES.get(action);
+  if (type === undefined) {
+    type = matchAction(action);
+    if (ACTION_TYPES.size >= ACTION_TYPES_MAX) ACTION_TYPES.clear();
+    ACTION_TYPES.set(action, type);
+  }
+  return type;
+}
+
+function emptyLedger(symbol, closed) {
+  return {
+    symbol,
+    events: [],
+    cashflows: [],
+    dividendEvents: [],
+    shareHistory: [],
+    totalContributions: 0,
+    totalWithdrawals: 0,
+    netInvestedCash: 0,
+    dividendsReceived: 0,
+    currentShares: 0,
+    startDate: null,
+    endDate: null,
+    closed,
+    positionCostBasis: 0,
+    effectiveCostBasis: 0,
+    description: null,
+  };
+}
+
+const EVENT_ORDER = { dividend: 0, reinvest: 1, buy: 2, sell: 3, other: 4 };
+
 function parseActivity(rows) {
   const ledgers = new Map();
   const entries = dedupe(rows);
   entries.forEach((row, index) => {
     const action = String(row.Action || "");
-    const symRaw = row.Symbol ?? "";
     const desc = row.Description ?? "";
-    const symbol = extractSymbol(symRaw, desc, action);
-    if (!symbol || isCashLike(symRaw, desc)) return;
+    const su = upperTrim(row.Symbol);
+    const du = upperTrim(desc);
+    if (isCashLike(su, du)) return;
+    const symbol = extractSymbol(su, du, action);
+    if (!symbol) return;
 
     const eventType = classifyAction(action);
     if (eventType === "other") return;
@@ -123,24 +180,7 @@ function parseActivity(rows) {
       toNumber(row["Net Amount ($)"])
     );
 
-    const ledger = ledgers.get(symbol) || {
-      symbol,
-      events: [],
-      cashflows: [],
-      dividendEvents: [],
-      shareHistory: [],
-      totalContributions: 0,
-      totalWithdrawals: 0,
-      netInvestedCash: 0,
-      dividendsReceived: 0,
-      currentShares: 0,
-      startDate: null,
-      endDate: null,
-      closed: false,
-      positionCostBasis: 0,
-      effectiveCostBasis: 0,
-      description: null,
-    };
+    const ledger = ledgers.get(symbol) || emptyLedger(symbol, false);
 
     const event = {
       date,
@@ -185,26 +225,23 @@ function parseActivity(rows) {
   for (const ledger of ledgers.values()) {
     if (!ledger.events.length) continue;
     ledger.events.sort((a, b) => {
-      if (a.date < b.date) return -1;
-      if (a.date > b.date) return 1;
-      const order = { dividend: 0, reinvest: 1, buy: 2, sell: 3, other: 4 };
-      const oa = order[a.eventType] ?? 9;
-      const ob = order[b.eventType] ?? 9;
+      const dt = a.date.getTime() - b.date.getTime();
+      if (dt !== 0) return dt;
+      const oa = EVENT_ORDER[a.eventType] ?? 9;
+      const ob = EVENT_ORDER[b.eventType] ?? 9;
       if (oa !== ob) return oa - ob;
       return a.sequence - b.sequence;
     });
+    const startDate = ledger.events[0].date;
+    const endDate = ledger.events[ledger.events.length - 1].date;
     let shares = 0;
     const shareHistory = [];
     const dividendEvents = [];
     const cashflows = [];
-    let startDate = null;
-    let endDate = null;
     let totalContrib = 0;
     let totalWithdrawals = 0;
     let dividendsPaid = 0;
     ledger.events.forEach(event => {
-      if (!startDate || event.date < startDate) startDate = event.date;
-      if (!endDate || event.date > endDate) endDate = event.date;
       const before = shares;
       shares += event.sharesDelta;
       const after = shares;
@@ -247,10 +284,12 @@ function parsePositions(rows) {
   const entries = dedupe(rows);
   const positions = new Map();
   entries.forEach(row => {
-    const symRaw = row.Symbol ?? "";
     const desc = row.Description ?? "";
-    const symbol = extractSymbol(symRaw, desc);
-    if (!symbol || isCashLike(symRaw, desc)) return;
+    const su = upperTrim(row.Symbol);
+    const du = upperTrim(desc);
+    if (isCashLike(su, du)) return;
+    const symbol = extractSymbol(su, du);
+    if (!symbol) return;
     const qty = toNumber(row.Quantity);
     if (qty <= 0) return;
     const cost = toNumber(row["Cost Basis Total"] ?? row["Cost Basis"]);
@@ -266,32 +305,14 @@ function parsePositions(rows) {
 export function buildPortfolioModel(activityRows, positionRows) {
   const ledgers = parseActivity(activityRows);
   const positions = parsePositions(positionRows);
-  const symbols = new Set([...ledgers.keys(), ...positions.keys()]);
+  ACTION_TYPES.clear();
+  UPPER_TRIM.clear();
+  for (const symbol of positions.keys()) {
+    if (!ledgers.has(symbol)) ledgers.set(symbol, emptyLedger(symbol, true));
+  }
   let startDate = null;
   let endDate = null;
-  for (const symbol of symbols) {
-    let ledger = ledgers.get(symbol);
-    if (!ledger) {
-      ledger = {
-        symbol,
-        events: [],
-        cashflows: [],
-        dividendEvents: [],
-        shareHistory: [],
-        totalContributions: 0,
-        totalWithdrawals: 0,
-        netInvestedCash: 0,
-        dividendsReceived: 0,
-        currentShares: 0,
-        startDate: null,
-        endDate: null,
-        closed: true,
-        positionCostBasis: 0,
-        effectiveCostBasis: 0,
-        description: null,
-      };
-      ledgers.set(symbol, ledger);
-    }
+  for (const [symbol, ledger] of ledgers) {
     const pos = positions.get(symbol);
     if (pos) {
       ledger.positionCostBasis = pos.costBasis;
@@ -315,7 +336,7 @@ export function buildPortfolioModel(activityRows, positionRows) {
   }
 
   return {
-    symbols: Object.fromEntries([...ledgers.entries()]),
+    symbols: Object.fromEntries(ledgers),
     startDate,
     endDate,
   };
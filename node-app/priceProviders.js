@@ -1,11 +1,70 @@
+import fs from 'fs';
+import path from 'path';
+import { fileURLToPath } from 'url';
 import yahooFinance from 'yahoo-finance2';
 
+const __dirname = path.dirname(fileURLToPath(import.meta.url));
+const CACHE_FILE = path.resolve(__dirname, '..', 'data', 'price_cache.json');
+
 const TTL_MS = 15 * 60 * 1000;
-const CACHE = new Map();
+const QUOTE_CHUNK = 40;
+const CACHE_MAX = 4096;
+const HISTORY_CACHE_MAX = 16;
+const CACHE = loadPriceCache();
 const HISTORY_CACHE = new Map();
+let refreshSymbols = [];
+let lastRequestAt = 0;
 
-function cleanSymbol(s) {
-  if (!s) return null;
+function boundedSet(map, key, value, max) {
+  map.delete(key);
+  map.set(key, value);
+  while (map.size > max) map.delete(map.keys().next().value);
+}
+
+// In-memory timestamps are performance.now() values; the file stores
+// wall-clock times, so both directions shift by Date.now() - performance.now().
+function loadPriceCache() {
+  const cache = new Map();
+  try {
+    const saved = JSON.parse(fs.readFileSync(CACHE_FILE, 'utf8'));
+    const offset = Date.now() - performance.now();
+    const entries = Object.entries(saved)
+      .filter(([, entry]) => entry && entry.price != null)
+      .sort((a, b) => a[1].ts - b[1].ts);
+    for (const [symbol, entry] of entries) {
+      const ts = entry.ts - offset;
+      if (performance.now() - ts <= TTL_MS) boundedSet(cache, symbol, { price: entry.price, ts }, CACHE_MAX);
+    }
+  } catch (err) {
+    if (err.code !== 'ENOENT') console.error('Ignoring unreadable price cache', err.message);
+  }
+  return cache;
+}
+
+let pendingSave = Promise.resolve();
+
+// Chained so overlapping saves never interleave on the temp file.
+function savePriceCache() {
+  const offset = Date.now() - performance.now();
+  const saved = {};
+  for (const [symbol, entry] of CACHE) saved[symbol] = { price: entry.price, ts: entry.ts + offset };
+  const body = JSON.stringify(saved);
+  const tmp = `${CACHE_FILE}.tmp`;
+  pendingSave = pendingSave
+    .then(async () => {
+      await fs.promises.mkdir(path.dirname(CACHE_FILE), { recursive: true });
+      await fs.promises.writeFile(tmp, body);
+      await fs.promises.rename(tmp, CACHE_FILE);
+    })
+    .catch(err => {
+      console.error('Failed to persist price cache', err.message);
+    });
+}
+
+const CLEAN_SYMBOLS = new Map();
+const CLEAN_SYMBOLS_MAX = 4096;
+
+function normalizeTicker(s) {
   s = s.trim().toUpperCase();
   if (!s || s === 'CASH') return null;
   if (s.startsWith('$')) s = s.slice(1);
@@ -13,44 +72,68 @@ function cleanSymbol(s) {
   return s;
 }
 
+function cleanSymbol(s) {
+  if (!s) return null;
+  let cs = CLEAN_SYMBOLS.get(s);
+  if (cs === undefined) {
+    cs = normalizeTicker(s);
+    if (CLEAN_SYMBOLS.size >= CLEAN_SYMBOLS_MAX) CLEAN_SYMBOLS.clear();
+    CLEAN_SYMBOLS.set(s, cs);
+  }
+  return cs;
+}
+
 function cacheKey(symbols, start, end, interval) {
   return [symbols.slice().sort().join(','), start ? start.toISOString() : '', end ? end.toISOString() : '', interval].join('|');
 }
 
-export async function getCurrentPrices(symbols) {
-  const cleaned = [];
+export async function getCurrentPrices(symbols, { refreshOnly = false } = {}) {
+  const unique = new Set();
   const rawToClean = {};
   for (const raw of symbols) {
     const cs = cleanSymbol(raw);
     rawToClean[raw] = cs;
-    if (cs && !cleaned.includes(cs)) cleaned.push(cs);
+    if (cs) unique.add(cs);
+  }
+  const cleaned = [...unique];
+  if (!refreshOnly) {
+    refreshSymbols = cleaned;
+    lastRequestAt = performance.now();
   }
   const result = {};
   const need = [];
-  const now = Date.now();
+  const now = performance.now();
   for (const s of cleaned) {
     const entry = CACHE.get(s);
-    if (entry && now - entry.ts <= TTL_MS) {
+    if (!refreshOnly && entry && now - entry.ts <= TTL_MS) {
       result[s] = entry.price;
+      boundedSet(CACHE, s, entry, CACHE_MAX);
     } else {
       need.push(s);
     }
   }
   if (need.length) {
-    try {
-      const quotes = await yahooFinance.quote(need);
-      const arr = Array.isArray(quotes) ? quotes : [quotes];
-      for (const q of arr) {
-        if (q && q.regularMarketPrice != null) {
-          result[q.symbol] = q.regularMarketPrice;
-          CACHE.set(q.symbol, { price: q.regularMarketPrice, ts: now });
-        } else if (q && q.symbol) {
-          result[q.symbol] = null;
+    const chunks = [];
+    for (let i = 0; i < need.length; i += QUOTE_CHUNK) chunks.push(need.slice(i, i + QUOTE_CHUNK));
+    let stored = false;
+    await Promise.all(chunks.map(async chunk => {
+      try {
+        const quotes = await yahooFinance.quote(chunk);
+        const arr = Array.isArray(quotes) ? quotes : [quotes];
+        for (const q of arr) {
+          if (q && q.regularMarketPrice != null) {
+            result[q.symbol] = q.regularMarketPrice;
+            boundedSet(CACHE, q.symbol, { price: q.regularMarketPrice, ts: now }, CACHE_MAX);
+            stored = true;
+          } else if (q && q.symbol) {
+            result[q.symbol] = null;
+          }
         }
+      } catch (err) {
+        for (const s of chunk) result[s] = null;
       }
-    } catch (err) {
-      for (const s of need) result[s] = null;
-    }
+    }));
+    if (stored) savePriceCache();
   }
   const out = {};
   for (const raw in rawToClean) {
@@ -60,6 +143,21 @@ export async function getCurrentPrices(symbols) {
   return out;
 }
 
+export function startPriceRefresher() {
+  const timer = setInterval(() => {
+    if (!refreshSymbols.length) return;
+    if (performance.now() - lastRequestAt > TTL_MS) {
+      refreshSymbols = [];
+      return;
+    }
+    getCurrentPrices(refreshSymbols, { refreshOnly: true }).catch(err => {
+      console.error('Price refresh failed', err);
+    });
+  }, TTL_MS / 2);
+  timer.unref();
+  return timer;
+}
+
 export async function getPriceHistory(symbols, start, end, interval = '1d') {
   const cleaned = symbols.map(cleanSymbol).filter(Boolean);
   if (!cleaned.length) return {};
@@ -82,6 +180,6 @@ export async function getPriceHistory(symbols, start, end, interval = '1d') {
       result[symbol] = [];
     }
   }));
-  HISTORY_CACHE.set(key, result);
+  boundedSet(HISTORY_CACHE, key, result, HISTORY_CACHE_MAX);
   return result;
 }